@@ -1,240 +1,409 @@
+import os
 import re
+import sys
+import shutil
+import io
 import ast
 from pathlib import Path
 from typing import Set, Dict, List
-from collections import defaultdict
+from collections import defaultdict, deque
+from operator import itemgetter
 
-def parse_imports_with_names(file_path):
-    """Extract what is imported from each module."""
-    imports = {}  # {module: [names]}
+OUTPUT_BUFFER_SIZE = 1 << 20  # 1 MiB write buffer for the output file
+COPY_CHUNK_SIZE = 1 << 20  # chunk size for whole-file copies
+FILE_SEP = "=" * 60
+TREE_ORDER = itemgetter(1, 0)  # (name, is_dir) items: files first, then by name
+# Nodes that can contain statements (match_case only exists on Python 3.10+)
+STATEMENT_NODES = tuple(
+    getattr(ast, name) for name in ('stmt', 'excepthandler', 'match_case')
+    if hasattr(ast, name)
+)
+
+# Standard-library and third-party top-level packages that are never resolved
+STDLIB_SKIP = frozenset({
+    'os', 'sys', 're', 'cv2', 'uuid', 'numpy', 'tensorflow',
+    'PIL', 'flask', 'urllib', 'json', 'time', 'gc', 'io',
+    'paddleocr', 'ultralytics', 'torch', 'requests', 'certifi', 'urllib3',
+})
+
+def _read_source(path_str):
+    """Read and decode a whole file with a single raw readall()."""
+    # Raw FileIO skips the buffered/text layers (and their isatty probe);
+    # readall() already sizes its buffer from fstat
+    with io.FileIO(path_str, 'r') as f:
+        raw = f.readall()
+    
+    data = raw.decode('utf-8', errors='ignore')
+    # Same universal-newline handling as a text-mode open()
+    if '\r' in data:
+        data = data.replace('\r\n', '\n').replace('\r', '\n')
+    return data
+
+def iter_statements(tree):
+    """Yield statements in ast.walk order without visiting expression nodes.
+    
+    except handlers and match cases are yielded too, as in ast.walk, so their
+    bodies are expanded at the same depth.
+    """
+    queue = deque(tree.body)
+    while queue:
+        node = queue.popleft()
+        yield node
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, STATEMENT_NODES):
+                queue.append(child)
+
+def analyze_file(file_path):
+    """Parse a file once and collect its imports, globals, definitions and line count."""
+    # The tree is only needed inside this call; don't keep it around
+    data = _read_source(str(file_path))
+    tree = ast.parse(data)
+    lines = data.splitlines()
     
+    imports = {}  # {module: [names]}
+    globals_code = []
+    definitions = {}  # {name: code}
+    
+    # Get all top-level assignments and imports
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.Assign)):
+            start = node.lineno - 1
+            end = node.end_lineno if node.end_lineno else start + 1
+            globals_code.extend(lines[start:end])
+    
+    # Imports and definitions are statements, so expressions can be skipped
+    for node in iter_statements(tree):
+        if isinstance(node, ast.ImportFrom):
+            if node.module:
+                module = node.module
+                names = [alias.name for alias in node.names]
+                if module not in imports:
+                    imports[module] = []
+                imports[module].extend(names)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                imports[alias.name] = ['*']  # Import entire module
+        elif isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            # First match wins, same as a lookup by name
+            if node.name not in definitions:
+                start_line = node.lineno - 1
+                end_line = node.end_lineno if node.end_lineno else start_line + 1
+                definitions[node.name] = '\n'.join(lines[start_line:end_line])
+    
+    return imports, '\n'.join(globals_code), definitions, len(lines)
+
+def _analyze_or_warn(file_path):
+    """Run analyze_file, or warn and return None if the file cannot be parsed."""
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            tree = ast.parse(f.read())
-        
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ImportFrom):
-                if node.module:
-                    module = node.module
-                    names = [alias.name for alias in node.names]
-                    if module not in imports:
-                        imports[module] = []
-                    imports[module].extend(names)
-            elif isinstance(node, ast.Import):
-                for alias in node.names:
-                    imports[alias.name] = ['*']  # Import entire module
-    
+        return analyze_file(file_path)
     except Exception as e:
         print(f"[WARNING] Could not parse {file_path}: {e}")
-    
-    return imports
+        return None
 
-def extract_function_or_class(file_path, name):
-    """Extract a specific function or class definition from a file."""
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            tree = ast.parse(content)
-        
-        lines = content.splitlines()
-        
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
-                if node.name == name:
-                    # Get line numbers
-                    start_line = node.lineno - 1
-                    end_line = node.end_lineno if node.end_lineno else start_line + 1
-                    
-                    # Extract the code
-                    code_lines = lines[start_line:end_line]
-                    return '\n'.join(code_lines)
+def build_module_index(project_dir, exclude_re=None):
+    """Map every importable module under project_dir to its file in one walk."""
+    module_index = {}  # {dotted module name: path}
+    # (directory, dotted package prefix, real paths of the directory and its
+    # ancestors); symlinked directories are followed, and a directory whose
+    # real path is already on its own descent chain would be a cycle
+    stack = [(str(project_dir), '', (os.path.realpath(project_dir),))]
+    
+    while stack:
+        directory, package, ancestors = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            continue
         
-        return None
+        for entry in entries:
+            name = entry.name
+            if entry.is_dir():
+                # Only identifiers can appear in a dotted import, so venvs,
+                # site-packages, .git etc. are never descended into
+                if not name.isidentifier() or is_excluded(entry.path, exclude_re):
+                    continue
+                
+                real_path = os.path.realpath(entry.path)
+                if real_path in ancestors:
+                    continue
+                
+                stack.append((entry.path, f"{package}{name}.", ancestors + (real_path,)))
+            elif name.endswith('.py') and entry.is_file():
+                stem = name[:-3]
+                if not stem.isidentifier() or is_excluded(entry.path, exclude_re):
+                    continue
+                
+                file_path = Path(entry.path)
+                module_index[package + stem] = file_path
+                if stem == '__init__' and package:
+                    # A module file takes precedence over a same-named package
+                    module_index.setdefault(package[:-1], file_path)
     
-    except Exception as e:
-        print(f"[WARNING] Could not extract {name} from {file_path}: {e}")
+    return module_index
+
+def compile_exclude_patterns(exclude_patterns):
+    """Combine substring exclude patterns into one regex (None if there are none)."""
+    if not exclude_patterns:
         return None
+    return re.compile('|'.join(re.escape(pattern) for pattern in exclude_patterns))
 
-def get_global_variables(file_path):
-    """Extract global variables and imports from a file."""
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        lines = content.splitlines()
-        globals_code = []
-        
-        tree = ast.parse(content)
-        
-        # Get all top-level assignments and imports
-        for node in tree.body:
-            if isinstance(node, (ast.Import, ast.ImportFrom, ast.Assign)):
-                start = node.lineno - 1
-                end = node.end_lineno if node.end_lineno else start + 1
-                globals_code.extend(lines[start:end])
-        
-        return '\n'.join(globals_code) if globals_code else ""
-    
-    except Exception as e:
-        return ""
+def is_excluded(file_path, exclude_re):
+    """Check whether a path matches the compiled exclude patterns."""
+    return exclude_re is not None and exclude_re.search(str(file_path)) is not None
+
+def describe_file(file_path, project_dir, prefix=None):
+    """Return (path, relative path, relative directory) strings for a file."""
+    if prefix is None:
+        prefix = str(project_dir) + os.sep
+    
+    path_str = str(file_path)
+    if path_str.startswith(prefix):
+        rel_str = path_str[len(prefix):]
+    else:
+        # e.g. project_dir "." where paths carry no prefix at all
+        rel_str = str(Path(file_path).relative_to(project_dir))
+    
+    return path_str, rel_str, os.path.dirname(rel_str) or '(root)'
+
+def describe_files(files, project_dir):
+    """Describe every file up-front so printing and writing can reuse it."""
+    prefix = str(project_dir) + os.sep
+    return {file_path: describe_file(file_path, project_dir, prefix) for file_path in files}
 
-def resolve_import_to_file(import_name, project_dir):
-    """Convert import name to file path."""
-    path = import_name.replace('.', '/')
+def build_tree(files, project_dir, file_info=None):
+    """Build a flat tree: {parent parts: {child name: is_dir}}."""
+    if file_info is None:
+        file_info = describe_files(files, project_dir)
     
-    py_file = project_dir / f"{path}.py"
-    if py_file.exists():
-        return py_file
+    children = defaultdict(dict)
     
-    init_file = project_dir / path / "__init__.py"
-    if init_file.exists():
-        return init_file
+    for file_path in files:
+        parts = tuple(file_info[file_path][1].split(os.sep))
+        last = len(parts) - 1
+        for i in range(len(parts)):
+            # Every part but the last one is a directory
+            children[parts[:i]][parts[i]] = i != last
     
-    return None
+    return children
 
-def build_tree_structure(files, project_dir):
-    """Build a tree structure from file paths."""
-    tree = {}
+def _iter_tree_lines(children, max_files_per_dir=None):
+    """Yield formatted tree lines depth-first using an explicit stack.
     
-    for file_path in files:
-        rel_path = file_path.relative_to(project_dir)
-        parts = rel_path.parts
-        
-        current = tree
-        for i, part in enumerate(parts):
-            if part not in current:
-                # Check if this is the last part (file)
-                is_file = (i == len(parts) - 1)
-                current[part] = {'_is_file': is_file, '_children': {}}
-            current = current[part]['_children']
-    
-    return tree
-
-def print_tree(tree, prefix="", is_last=True, max_files_per_dir=8):
-    """Print tree structure with proper formatting."""
-    items = sorted(tree.items(), key=lambda x: (not x[1]['_is_file'], x[0]))
+    Directories with more than max_files_per_dir children are shown truncated;
+    None means never truncate.
+    """
+    # Stack entries: (parent key, name, is_dir, prefix, is_last), pushed in
+    # reverse so they pop in sorted order (files first, then directories)
+    stack = []
+    push = stack.append
     
-    for idx, (name, data) in enumerate(items):
-        is_last_item = (idx == len(items) - 1)
+    level = sorted(children[()].items(), key=TREE_ORDER)
+    last = len(level) - 1
+    for idx in range(last, -1, -1):
+        push(((), *level[idx], "", idx == last))
+    
+    while stack:
+        key, name, is_dir, prefix, is_last = stack.pop()
         
         # Determine connector
-        if is_last_item:
+        if is_last:
             connector = "└── "
             extension = "    "
         else:
             connector = "├── "
             extension = "│   "
         
-        # Print current item
-        if data['_is_file']:
-            print(f"{prefix}{connector}📄 {name}")
-        else:
-            # Count files in this directory
-            child_count = len(data['_children'])
-            print(f"{prefix}{connector}📁 {name}/")
+        if not is_dir:
+            yield f"{prefix}{connector}📄 {name}\n"
+            continue
+        
+        yield f"{prefix}{connector}📁 {name}/\n"
+        
+        child_key = key + (name,)
+        dir_children = children[child_key]
+        child_prefix = prefix + extension
+        
+        # Count files in this directory; if more than max_files, show truncated
+        child_count = len(dir_children)
+        if max_files_per_dir is not None and child_count > max_files_per_dir:
+            # Show first max_files items
+            for child_name, child_is_dir in list(dir_children.items())[:max_files_per_dir]:
+                if child_is_dir:
+                    yield f"{child_prefix}├── 📁 {child_name}/\n"
+                else:
+                    yield f"{child_prefix}├── 📄 {child_name}\n"
             
-            # If more than max_files, show truncated
-            if child_count > max_files_per_dir:
-                # Show first max_files items
-                shown_items = list(data['_children'].items())[:max_files_per_dir]
-                for child_name, child_data in shown_items:
-                    child_prefix = prefix + extension
-                    if child_data['_is_file']:
-                        print(f"{child_prefix}├── 📄 {child_name}")
-                    else:
-                        print(f"{child_prefix}├── 📁 {child_name}/")
-                
-                # Show ellipsis
-                print(f"{child_prefix}├── ...")
-                print(f"{child_prefix}└── (up to {child_count} files in this directory)")
-            else:
-                # Recursively print children
-                print_tree(data['_children'], prefix + extension, is_last_item, max_files_per_dir)
+            # Show ellipsis
+            yield f"{child_prefix}├── ...\n"
+            yield f"{child_prefix}└── (up to {child_count} files in this directory)\n"
+            continue
+        
+        level = sorted(dir_children.items(), key=TREE_ORDER)
+        last = len(level) - 1
+        for idx in range(last, -1, -1):
+            push((child_key, *level[idx], child_prefix, idx == last))
 
-def print_directory_structure(files, project_dir):
+def print_directory_structure(files, project_dir, file_info=None):
     """Print directory structure in tree format."""
-    print("\n" + "="*80)
-    print("PROJECT DIRECTORY STRUCTURE (TREE VIEW)")
-    print("="*80)
-    
-    total_files = len(files)
-    print(f"\nTotal Files to Extract: {total_files}")
-    print(f"Project Root: {project_dir}\n")
-    
     # Build tree
-    tree = build_tree_structure(files, project_dir)
-    
-    # Print tree
-    print(f"📁 {project_dir.name}/")
-    print_tree(tree, prefix="", is_last=True, max_files_per_dir=8)
-    
-    print("\n" + "="*80 + "\n")
+    tree = build_tree(files, project_dir, file_info)
+    
+    buf = [
+        "\n" + "="*80 + "\n",
+        "PROJECT DIRECTORY STRUCTURE (TREE VIEW)\n",
+        "="*80 + "\n",
+        f"\nTotal Files to Extract: {len(files)}\n",
+        f"Project Root: {project_dir}\n\n",
+        f"📁 {project_dir.name}/\n",
+    ]
+    buf.extend(_iter_tree_lines(tree, max_files_per_dir=8))
+    buf.append("\n" + "="*80 + "\n\n")
+    
+    # Print everything in one write
+    sys.stdout.write(''.join(buf))
 
-def print_file_locations(files, project_dir):
+def print_file_locations(files, project_dir, file_info=None):
     """Print detailed file locations and paths."""
-    print("="*80)
-    print("DETAILED FILE LOCATIONS")
-    print("="*80 + "\n")
+    if file_info is None:
+        file_info = describe_files(files, project_dir)
     
-    for idx, file_path in enumerate(sorted(files, key=lambda x: str(x)), 1):
-        rel_path = file_path.relative_to(project_dir)
-        abs_path = file_path.absolute()
-        
-        print(f"[{idx:02d}] {rel_path}")
-        print(f"     Absolute: {abs_path}")
-        print(f"     Directory: {file_path.parent.relative_to(project_dir) if file_path.parent != project_dir else '(root)'}")
-        print()
+    buf = [
+        "="*80 + "\n",
+        "DETAILED FILE LOCATIONS\n",
+        "="*80 + "\n\n",
+    ]
     
-    print("="*80 + "\n")
+    cwd = os.getcwd()
+    
+    for idx, (path_str, rel_str, dir_str) in enumerate(sorted(file_info[f] for f in files), 1):
+        buf.append(
+            f"[{idx:02d}] {rel_str}\n"
+            f"     Absolute: {os.path.join(cwd, path_str)}\n"
+            f"     Directory: {dir_str}\n\n"
+        )
+    
+    buf.append("="*80 + "\n\n")
+    
+    # Print everything in one write
+    sys.stdout.write(''.join(buf))
 
-def discover_files(project_dir, entry_file, exclude_patterns):
-    """First pass: discover all files that will be processed."""
+def discover_files(project_dir, entry_file, exclude_patterns, module_index=None):
+    """First pass: discover all files that will be processed.
+    
+    Returns (discovered_files, file_name_map, file_analysis) where
+    file_name_map holds, for each reachable file, every name imported from it
+    across all import edges (in first-seen order; '*' means the whole file)
+    and file_analysis holds its analyze_file result (None if unparsable).
+    """
     project_dir = Path(project_dir)
     entry_file = Path(entry_file)
     
-    files_to_process = [(entry_file, ['*'])]
-    processed = set()
+    exclude_re = compile_exclude_patterns(exclude_patterns)
+    if module_index is None:
+        module_index = build_module_index(project_dir, exclude_re)
+    
+    files_to_process = deque([entry_file])
+    file_name_map = {entry_file: {'*': None}}  # {path: ordered set of names}
+    pruned = set()
     discovered_files = []
+    file_analysis = {}
+    
+    # Bind hot-loop methods once
+    pop_next = files_to_process.popleft
+    push = files_to_process.append
     
     while files_to_process:
-        current_file, names_to_extract = files_to_process.pop(0)
-        
-        if current_file in processed:
-            continue
-        
-        processed.add(current_file)
+        current_file = pop_next()
         
         # Check exclusions
-        should_exclude = False
-        for pattern in exclude_patterns:
-            if pattern in str(current_file):
-                should_exclude = True
-                break
-        
-        if should_exclude:
+        if is_excluded(current_file, exclude_re):
             continue
         
         discovered_files.append(current_file)
         
+        # Keep the analysis so the extraction pass never has to parse again
+        analysis = file_analysis[current_file] = _analyze_or_warn(current_file)
+        if analysis is None:
+            continue
+        
         # Get imports from this file
         try:
-            imports = parse_imports_with_names(current_file)
+            imports = analysis[0]
             
             # Process imports
             for module, names in imports.items():
-                # Skip standard libraries
-                if module in ['os', 'sys', 're', 'cv2', 'uuid', 'numpy', 'tensorflow', 
-                              'PIL', 'flask', 'urllib', 'json', 'time', 'gc', 'io',
-                              'paddleocr', 'ultralytics', 'torch', 'requests', 'certifi', 'urllib3']:
+                # Skip standard libraries (and their submodules, e.g. urllib.request)
+                if module.split('.', 1)[0] in STDLIB_SKIP:
                     continue
                 
-                file_path = resolve_import_to_file(module, project_dir)
-                if file_path and file_path not in processed:
-                    files_to_process.append((file_path, names))
+                file_path = module_index.get(module)
+                if file_path is None or file_path in pruned:
+                    continue
+                
+                requested = file_name_map.get(file_path)
+                if requested is None:
+                    # Prune excluded files before they are ever queued
+                    if is_excluded(file_path, exclude_re):
+                        pruned.add(file_path)
+                        continue
+                    requested = file_name_map[file_path] = {}
+                    push(file_path)
+                
+                requested.update(dict.fromkeys(names))
         except:
             pass
     
-    return discovered_files
+    return discovered_files, file_name_map, file_analysis
+
+def _extract_stream(discovered_files, file_name_map, file_analysis, file_info):
+    """Yield (file_path, code, line_count) for each discovered file as it is extracted.
+    
+    code is None when the whole file is used and should be copied verbatim.
+    """
+    for current_file in discovered_files:
+        names_to_extract = file_name_map[current_file]
+        
+        print(f"[PROCESS] {file_info[current_file][1]}")
+        
+        # Reuse the analysis from discovery (its warning was already printed)
+        analysis = file_analysis[current_file]
+        if analysis is None:
+            globals_code, definitions, line_count = "", {}, None
+        else:
+            _, globals_code, definitions, line_count = analysis
+        
+        # Build code for this file
+        file_code_parts = []
+        
+        # Add global variables and imports
+        if globals_code:
+            file_code_parts.append(globals_code)
+        
+        # Extract specific functions/classes or entire file
+        if '*' in names_to_extract:
+            # Import entire file
+            code = None
+            if line_count is None:
+                # Unparsable file: count its lines directly
+                line_count = len(_read_source(str(current_file)).splitlines())
+            print(f"  → Extracted entire file")
+        else:
+            # Extract only specific names
+            for name in names_to_extract:
+                if name == '*':
+                    continue
+                definition = definitions.get(name)
+                if definition:
+                    file_code_parts.append(f"\n{definition}")
+                    print(f"  → Extracted function/class: {name}")
+                else:
+                    print(f"  ⚠ Could not find: {name}")
+            
+            code = '\n\n'.join(file_code_parts)
+            line_count = len(code.splitlines())
+        
+        yield current_file, code, line_count
 
 def extract_used_code(project_dir, entry_file, output_file, exclude_patterns=None):
     """Extract only the functions/classes that are actually used."""
@@ -253,147 +422,82 @@ def extract_used_code(project_dir, entry_file, output_file, exclude_patterns=Non
     print(f"Output File: {output_file}")
     print(f"Exclude Patterns: {', '.join(exclude_patterns)}")
     
+    # Index every project module once; both passes resolve imports from it
+    exclude_re = compile_exclude_patterns(exclude_patterns)
+    module_index = build_module_index(project_dir, exclude_re)
+    
     # PHASE 1: Discover all files
     print("\n[PHASE 1] Discovering all files that will be processed...")
-    discovered_files = discover_files(project_dir, entry_file, exclude_patterns)
+    discovered_files, file_name_map, file_analysis = discover_files(
+        project_dir, entry_file, exclude_patterns, module_index
+    )
+    
+    # Relative paths are computed once and shared by every later phase
+    file_info = describe_files(discovered_files, project_dir)
     
     # Print directory structure
-    print_directory_structure(discovered_files, project_dir)
+    print_directory_structure(discovered_files, project_dir, file_info)
     
     # Print detailed locations
-    print_file_locations(discovered_files, project_dir)
+    print_file_locations(discovered_files, project_dir, file_info)
     
-    # PHASE 2: Extract code
+    # PHASE 2: Extract code, writing each file out as soon as it is extracted
     print("="*80)
     print("EXTRACTION PHASE - Extracting code from discovered files")
     print("="*80 + "\n")
     
-    files_to_process = [(entry_file, ['*'])]
-    processed = set()
-    extracted_code = {}
-    
-    while files_to_process:
-        current_file, names_to_extract = files_to_process.pop(0)
-        
-        if current_file in processed:
-            continue
-        
-        processed.add(current_file)
-        
-        # Check exclusions
-        should_exclude = False
-        for pattern in exclude_patterns:
-            if pattern in str(current_file):
-                print(f"[SKIP] {current_file.relative_to(project_dir)}")
-                should_exclude = True
-                break
-        
-        if should_exclude:
-            continue
-        
-        print(f"[PROCESS] {current_file.relative_to(project_dir)}")
-        
-        # Get imports from this file
-        imports = parse_imports_with_names(current_file)
-        
-        # Build code for this file
-        file_code_parts = []
-        
-        # Add global variables and imports
-        globals_code = get_global_variables(current_file)
-        if globals_code:
-            file_code_parts.append(globals_code)
-        
-        # Extract specific functions/classes or entire file
-        if '*' in names_to_extract:
-            # Import entire file
-            with open(current_file, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            extracted_code[current_file] = content
-            print(f"  → Extracted entire file")
-        else:
-            # Extract only specific names
-            for name in names_to_extract:
-                if name == '*':
-                    continue
-                code = extract_function_or_class(current_file, name)
-                if code:
-                    file_code_parts.append(f"\n{code}")
-                    print(f"  → Extracted function/class: {name}")
-                else:
-                    print(f"  ⚠ Could not find: {name}")
-            
-            extracted_code[current_file] = '\n\n'.join(file_code_parts)
-        
-        # Process imports from this file
-        for module, names in imports.items():
-            # Skip standard libraries
-            if module in ['os', 'sys', 're', 'cv2', 'uuid', 'numpy', 'tensorflow', 
-                          'PIL', 'flask', 'urllib', 'json', 'time', 'gc', 'io',
-                          'paddleocr', 'ultralytics', 'torch', 'requests', 'certifi', 'urllib3']:
-                continue
-            
-            file_path = resolve_import_to_file(module, project_dir)
-            if file_path and file_path not in processed:
-                files_to_process.append((file_path, names))
-    
-    # Write output
-    print(f"\n{'='*80}")
-    print("WRITING OUTPUT FILE")
-    print(f"{'='*80}\n")
-    
-    # Build tree for output file
-    tree = build_tree_structure(extracted_code.keys(), project_dir)
+    # Build tree for output file from the discovered files
+    tree = build_tree(discovered_files, project_dir, file_info)
     
+    total_files = 0
     total_lines = 0
-    with open(output_file, 'w', encoding='utf-8') as out:
+    # Binary output so whole files can be copied without decoding them
+    with open(output_file, 'wb', buffering=OUTPUT_BUFFER_SIZE) as out:
         # Write header with file list
-        out.write("="*80 + "\n")
-        out.write("EXTRACTED FILES SUMMARY\n")
-        out.write("="*80 + "\n\n")
-        out.write(f"Total Files: {len(extracted_code)}\n")
-        out.write(f"Project Root: {project_dir}\n\n")
-        
-        out.write("Directory Tree Structure:\n")
-        out.write(f"📁 {project_dir.name}/\n")
-        
-        # Write tree to file
-        def write_tree(tree_dict, prefix="", is_last=True):
-            items = sorted(tree_dict.items(), key=lambda x: (not x[1]['_is_file'], x[0]))
-            for idx, (name, data) in enumerate(items):
-                is_last_item = (idx == len(items) - 1)
-                connector = "└── " if is_last_item else "├── "
-                extension = "    " if is_last_item else "│   "
-                
-                if data['_is_file']:
-                    out.write(f"{prefix}{connector}📄 {name}\n")
-                else:
-                    out.write(f"{prefix}{connector}📁 {name}/\n")
-                    write_tree(data['_children'], prefix + extension, is_last_item)
-        
-        write_tree(tree)
-        out.write("\n" + "="*80 + "\n\n")
+        out.write((
+            "="*80 + "\n"
+            "EXTRACTED FILES SUMMARY\n"
+            + "="*80 + "\n\n"
+            f"Total Files: {len(discovered_files)}\n"
+            f"Project Root: {project_dir}\n\n"
+            "Directory Tree Structure:\n"
+            f"📁 {project_dir.name}/\n"
+        ).encode('utf-8'))
+        
+        # Write tree to file (never truncated), encoded and written in one go
+        tree_lines = list(_iter_tree_lines(tree))
+        tree_lines.append("\n" + "="*80 + "\n\n")
+        out.write(''.join(tree_lines).encode('utf-8'))
         
         # Write code
-        for file_path, code in extracted_code.items():
-            lines = len(code.splitlines())
+        for file_path, code, lines in _extract_stream(discovered_files, file_name_map, file_analysis, file_info):
+            path_str, rel_str, dir_str = file_info[file_path]
+            total_files += 1
             total_lines += lines
             
-            out.write(f"\n{'='*60}\n")
-            out.write(f"FILE: {file_path}\n")
-            out.write(f"Relative Path: {file_path.relative_to(project_dir)}\n")
-            out.write(f"Directory: {file_path.parent.relative_to(project_dir) if file_path.parent != project_dir else '(root)'}\n")
-            out.write(f"Extracted Lines: {lines}\n")
-            out.write(f"{'='*60}\n\n")
-            out.write(code)
-            out.write("\n\n")
+            out.write((
+                f"\n{FILE_SEP}\n"
+                f"FILE: {path_str}\n"
+                f"Relative Path: {rel_str}\n"
+                f"Directory: {dir_str}\n"
+                f"Extracted Lines: {lines}\n"
+                f"{FILE_SEP}\n\n"
+            ).encode('utf-8'))
+            
+            if code is None:
+                # Whole file: bulk copy the source bytes
+                with open(file_path, 'rb') as src:
+                    shutil.copyfileobj(src, out, COPY_CHUNK_SIZE)
+                out.write(b"\n\n")
+            else:
+                out.write(f"{code}\n\n".encode('utf-8'))
             
-            print(f"[ADDED] {file_path.relative_to(project_dir)} ({lines} lines)")
+            print(f"[ADDED] {rel_str} ({lines} lines)")
     
     print(f"\n{'='*80}")
     print("EXTRACTION COMPLETE")
     print(f"{'='*80}")
-    print(f"✓ Extracted {len(extracted_code)} files with {total_lines} total lines")
+    print(f"✓ Extracted {total_files} files with {total_lines} total lines")
     print(f"✓ Output written to: {output_file}")
     print(f"{'='*80}\n")
 